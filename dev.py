@@ -1,6 +1,5 @@
-
 #!/usr/bin/env python3
-import os, sys, subprocess, time, socket
+import os, sys, subprocess, time, socket, argparse, hashlib, threading, urllib.request
 from pathlib import Path
 
 ROOT = Path(__file__).parent.resolve()
@@ -8,6 +7,11 @@ ENV = os.environ.copy()
 ENV.setdefault("UBI_API_KEY", "dev_api_key_change_me")
 ENV.setdefault("UBI_DB_PATH", str(ROOT / "data" / "ubi.db"))
 ENV.setdefault("UBI_METRICS_CSV", str(ROOT / "data" / "ops_metrics.csv"))
+ENV.setdefault("UBI_CONTEXT_GRID", str(ROOT / "data" / "context_grid.bin"))
+ENV.setdefault("UBI_INGEST_LOG", str(ROOT / "data" / "ingest_log"))
+ENV.setdefault("UBI_STARTUP_LOG", str(ROOT / "data" / "startup_times.csv"))
+REQS = ROOT / "requirements.txt"
+REQS_STAMP = ROOT / "data" / ".requirements.sha256"
 
 def free_port(preferred):
     import socket
@@ -22,26 +26,67 @@ def free_port(preferred):
         s.close()
     return port
 
-def install():
+def requirements_hash():
+    # keyed on the interpreter too, so switching venvs re-installs
+    return hashlib.sha256(sys.executable.encode() + REQS.read_bytes()).hexdigest()
+
+def install(mode="auto"):
+    if mode == "never":
+        return
+    digest = requirements_hash()
+    if mode == "auto" and REQS_STAMP.exists() and REQS_STAMP.read_text().strip() == digest:
+        print("✔ Dependencies unchanged since last install (requirements hash match); skipping pip")
+        return
     print("➡ Installing/Verifying dependencies")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", str(ROOT / "requirements.txt")])
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", str(REQS)])
+    REQS_STAMP.parent.mkdir(parents=True, exist_ok=True)
+    REQS_STAMP.write_text(digest)
 
 def init_db():
     subprocess.check_call([sys.executable, "-m", "src.common.db"], env=ENV, cwd=str(ROOT))
 
-def run():
+def init_context():
+    if not Path(ENV["UBI_CONTEXT_GRID"]).exists():
+        subprocess.check_call([sys.executable, "-m", "src.context.grid", "--out", ENV["UBI_CONTEXT_GRID"]], env=ENV, cwd=str(ROOT))
+
+def wait_http(name, url, launched, timeout=60):
+    # for services that can't report themselves once: streamlit only runs the script per browser session,
+    # and uvicorn starts a fresh process per --reload and per worker
+    from src.common.startup import report_ready
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            report_ready(name, launched, ENV["UBI_STARTUP_LOG"])
+            return
+        except OSError:
+            time.sleep(0.1)
+
+def run(mode="dev", workers=1):
     api_port = free_port(8000)
     dash_port = free_port(8501)
     procs = []
     def spawn(cmd, name):
         print("▶", name, ":", " ".join(cmd))
-        p = subprocess.Popen(cmd, cwd=str(ROOT), env=ENV)
+        env = dict(ENV, UBI_LAUNCH_TS=repr(time.time()))
+        p = subprocess.Popen(cmd, cwd=str(ROOT), env=env)
         procs.append(p)
-    spawn([sys.executable, "-m", "uvicorn", "src.api.app:app", "--reload", "--port", str(api_port)], "API")
-    spawn([sys.executable, "src/processing/processor.py"], "Processor")
-    spawn([sys.executable, "src/ingest/simulator.py", "--trips", "200", "--realtime"], "Simulator")
-    spawn([sys.executable, "-m", "streamlit", "run", "src/dashboard/app.py", "--server.port", str(dash_port)], "Dashboard")
-    print(f"🔥 Running | API: http://localhost:{api_port}/docs  |  Dashboard: http://localhost:{dash_port}")
+        return float(env["UBI_LAUNCH_TS"])
+    api_cmd = [sys.executable, "-m", "uvicorn", "src.api.app:app", "--port", str(api_port)]
+    if mode == "dev":
+        api_cmd.append("--reload")
+    else:
+        api_cmd += ["--workers", str(workers), "--log-level", "warning"]
+    launched = spawn(api_cmd, "API")
+    threading.Thread(target=wait_http, args=("api", f"http://localhost:{api_port}/health", launched), daemon=True).start()
+    spawn([sys.executable, "-m", "src.processing.processor"], "Processor")
+    spawn([sys.executable, "-m", "src.ingest.simulator", "--trips", "200", "--realtime"], "Simulator")
+    dash_cmd = [sys.executable, "-m", "streamlit", "run", "src/dashboard/app.py", "--server.port", str(dash_port)]
+    if mode == "prod":
+        dash_cmd += ["--server.headless", "true", "--server.fileWatcherType", "none"]
+    launched = spawn(dash_cmd, "Dashboard")
+    threading.Thread(target=wait_http, args=("dashboard", f"http://localhost:{dash_port}/_stcore/health", launched), daemon=True).start()
+    print(f"🔥 Running [{mode}] | API: http://localhost:{api_port}/docs  |  Dashboard: http://localhost:{dash_port}")
     print("Press Ctrl+C to stop.")
     try:
         while True:
@@ -52,6 +97,15 @@ def run():
                 p.terminate()
 
 if __name__ == "__main__":
-    install()
+    ap = argparse.ArgumentParser(description="One-click launcher for API, processor, simulator and dashboard.")
+    ap.add_argument("--install", choices=["auto", "always", "never"], default="auto",
+                    help="auto: pip install only when requirements.txt changed (default)")
+    ap.add_argument("--mode", choices=["dev", "prod"], default=os.environ.get("UBI_LAUNCH_MODE", "dev"),
+                    help="dev: uvicorn --reload; prod: no reload/file watchers, multiple API workers")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("UBI_API_WORKERS", "2")),
+                    help="uvicorn workers in prod mode")
+    args = ap.parse_args()
+    install(args.install)
     init_db()
-    run()
+    init_context()
+    run(args.mode, args.workers)
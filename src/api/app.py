@@ -1,8 +1,9 @@
 
-import os, sqlite3
+import os, json
 from pathlib import Path
 from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from src.common import profiling
 
 API_KEY = os.environ.get("UBI_API_KEY", "dev_api_key_change_me")
 DB_PATH = Path(os.environ.get("UBI_DB_PATH", "data/ubi.db"))
@@ -10,12 +11,33 @@ DB_PATH = Path(os.environ.get("UBI_DB_PATH", "data/ubi.db"))
 app = FastAPI(title="Telematics UBI Pro", version="1.0.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# UBI_PROFILE_REQUESTS=N profiles the first N requests; POST /debug/profile re-arms at runtime.
+# Both are per worker process; GET /debug/profile returns the newest capture any worker wrote.
+PROFILER = profiling.RequestProfiler("api")
+PROFILER.arm(os.environ.get("UBI_PROFILE_REQUESTS", "0"))
+
+class ProfileMiddleware:
+    # plain ASGI (not BaseHTTPMiddleware) so the disabled path is a single int check
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if PROFILER.remaining <= 0 or scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            return await self.app(scope, receive, send)
+        PROFILER.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            PROFILER.end()
+
+app.add_middleware(ProfileMiddleware)
+
 def check_key(x_api_key: str | None):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
 def read_sql(sql, params=()):
-    con = sqlite3.connect(str(DB_PATH))
+    con = profiling.connect(DB_PATH)
     cur = con.cursor()
     cur.execute(sql, params)
     cols = [d[0] for d in cur.description] if cur.description else []
@@ -23,6 +45,12 @@ def read_sql(sql, params=()):
     con.close()
     return rows
 
+def with_explanations(q):
+    # quotes store explanation factors as f_* columns; rebuild the JSON string the API has always returned
+    factors = {k[2:]: q.pop(k) for k in list(q) if k.startswith("f_")}
+    q["explanations"] = json.dumps({"rule": True, "factors": factors})
+    return q
+
 @app.get("/health")
 def health():
     return {"ok": True}
@@ -41,10 +69,22 @@ def quote(user_id: int, vehicle_id: int | None = None, x_api_key: str | None = H
     else:
         q = "SELECT * FROM quotes WHERE user_id=? ORDER BY created_at DESC LIMIT 1"
         rows = read_sql(q, (user_id,))
-    return rows[0] if rows else {"message": "No quote yet"}
+    return with_explanations(rows[0]) if rows else {"message": "No quote yet"}
 
 @app.get("/driver/summary")
 def summary(user_id: int, x_api_key: str | None = Header(default=None, convert_underscores=False)):
     check_key(x_api_key)
     r = read_sql("SELECT user_id, display_name, points, badges, risk_score FROM driver_summary WHERE user_id=?", (user_id,))
     return r[0] if r else {}
+
+@app.post("/debug/profile")
+def arm_profile(requests: int = 100, x_api_key: str | None = Header(default=None, convert_underscores=False)):
+    check_key(x_api_key)
+    return {"armed_requests": PROFILER.arm(requests), "worker_pid": os.getpid()}
+
+@app.get("/debug/profile")
+def last_profile(x_api_key: str | None = Header(default=None, convert_underscores=False)):
+    check_key(x_api_key)
+    if PROFILER.remaining > 0 or PROFILER.in_flight > 0:
+        return {"message": f"profiling in progress on worker {os.getpid()}, {PROFILER.remaining} requests to go"}
+    return PROFILER.latest() or {"message": "No profile captured yet"}
@@ -0,0 +1,428 @@
+# src/bench/pipeline.py
+# End-to-end pipeline benchmark on a throwaway SQLite DB, including context-grid lookups, plus
+# cold start of each service (measured once per invocation; it does not depend on data size).
+# Usage:
+#   python -m src.bench.pipeline --sizes 10k
+#   python -m src.bench.pipeline --sizes 10k,1m,10m --baseline data/bench_baseline.json
+#   python -m src.bench.pipeline --sizes 10k --save-baseline
+#
+# Every size runs in its own worker process with UBI_DB_PATH pointed at a fresh
+# temp DB, so module-level config in the services picks it up unchanged.
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_OUT = ROOT / "data" / "bench_results.json"
+DEFAULT_BASELINE = ROOT / "data" / "bench_baseline.json"
+API_KEY = "bench_api_key"
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def free_port():
+    s = socket.socket()
+    try:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
+
+
+# --------------------------- stages (worker side) --------------------------- #
+def bench_simulator(trips):
+    from src.ingest import simulator
+
+    start = time.perf_counter()
+    with redirect_stdout(sys.stderr):
+        simulator.main(trips, False)
+    elapsed = time.perf_counter() - start
+    return {"trips": trips, "seconds": round(elapsed, 3), "inserts_per_sec": round(trips / elapsed, 1)}
+
+
+def bench_processor(latency_rounds=20, batch=200):
+    import sqlite3
+    from src.common.db import DB_PATH, storage_report
+    from src.ingest.ingest_log import ShardedConsumer, encode_trip, open_writer
+    from src.ingest.simulator import simulate_trip
+    from src.processing.processor import step
+
+    con = sqlite3.connect(str(DB_PATH))
+    consumer = ShardedConsumer("processor")
+    # drain the backlog the simulator stage left in the log, one loop iteration at a time
+    processed = 0
+    start = time.perf_counter()
+    while True:
+        n, _ = step(con, consumer, batch)
+        if n == 0:
+            break
+        processed += n
+    drain = time.perf_counter() - start
+
+    # insert-to-quote: a fresh batch is appended + fsync'd, the next processor iterations pick it up
+    vehs = con.execute("SELECT id, user_id FROM vehicles").fetchall()
+    latencies = []
+    with open_writer() as log:
+        for _ in range(latency_rounds):
+            rows = [simulate_trip(uid, vid) for (vid, uid) in random.choices(vehs, k=batch)]
+            t0 = time.perf_counter()
+            for row in rows:
+                log.append(encode_trip(row))
+            log.flush()
+            while step(con, consumer, batch)[0]:
+                pass
+            latencies.append((time.perf_counter() - t0) * 1000)
+    storage = storage_report(con)
+    consumer.close()
+    con.close()
+    return {
+        "trips": processed,
+        "seconds": round(drain, 3),
+        "trips_per_sec": round(processed / max(drain, 1e-9), 1),
+        "insert_to_quote_p50_ms": round(pct(latencies, 50), 2),
+        "insert_to_quote_p95_ms": round(pct(latencies, 95), 2),
+        "quotes_per_trip": round(storage["quotes"]["rows"] / storage["processed_trips"], 3) if "quotes" in storage else None,
+        "quote_bytes_per_trip": storage.get("quotes", {}).get("bytes_per_trip"),
+    }
+
+
+def bench_startup(timeout=60):
+    """Cold start per service: spawn → ready, as reported by src.common.startup (or a health URL).
+    Runs in the parent against its own temp DB, once per invocation."""
+    tmp = Path(tempfile.mkdtemp(prefix="ubi_startup_"))
+    log = tmp / "startup.csv"
+    base_env = dict(os.environ, UBI_DB_PATH=str(tmp / "ubi.db"), UBI_STARTUP_LOG=str(log),
+                    UBI_METRICS_CSV=str(tmp / "ops_metrics.csv"), UBI_INGEST_LOG=str(tmp / "ingest_log"),
+                    UBI_CONTEXT_GRID=str(tmp / "context_grid.bin"))
+    api_port, dash_port = free_port(), free_port()
+    services = {
+        "api": ([sys.executable, "-m", "uvicorn", "src.api.app:app", "--port", str(api_port), "--log-level", "warning"],
+                f"http://127.0.0.1:{api_port}/health"),
+        "processor": ([sys.executable, "-m", "src.processing.processor"], None),
+        "simulator": ([sys.executable, "-m", "src.ingest.simulator", "--trips", "0"], None),
+        "dashboard": ([sys.executable, "-m", "streamlit", "run", "src/dashboard/app.py", "--server.port", str(dash_port),
+                       "--server.headless", "true", "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+                      f"http://127.0.0.1:{dash_port}/_stcore/health"),
+    }
+    out = {}
+    try:
+        subprocess.check_call([sys.executable, "-m", "src.common.db"], cwd=str(ROOT), env=base_env, stdout=subprocess.DEVNULL)
+        for name, (cmd, health_url) in services.items():
+            env = dict(base_env)
+            t0 = time.time()
+            env["UBI_LAUNCH_TS"] = repr(t0)
+            proc = subprocess.Popen(cmd, cwd=str(ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                ms = None
+                while ms is None and time.time() - t0 < timeout:
+                    if health_url:
+                        try:
+                            urllib.request.urlopen(health_url, timeout=1).read()
+                            ms = (time.time() - t0) * 1000
+                        except OSError:
+                            pass
+                    elif log.exists():
+                        for line in log.read_text().splitlines()[1:]:
+                            _, svc, val = line.split(",")
+                            if svc == name:
+                                ms = float(val)
+                    if ms is None:
+                        time.sleep(0.02)
+                out[f"{name}_ms"] = round(ms, 1) if ms is not None else None
+            finally:
+                if proc.poll() is None:
+                    proc.terminate()
+                proc.wait(timeout=10)
+
+        t0 = time.perf_counter()
+        subprocess.check_call([sys.executable, "src/models/train_model.py", "--help"], cwd=str(ROOT), stdout=subprocess.DEVNULL)
+        out["train_model_help_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+
+def bench_context(lookups=200_000, batch=200):
+    from src.context import geohash
+    from src.context.grid import GRID_PATH, REGION, ContextGrid
+
+    t0 = time.perf_counter()
+    grid = ContextGrid(GRID_PATH)
+    open_ms = (time.perf_counter() - t0) * 1000
+    rng = random.Random(0)
+    pts = [geohash.encode(rng.uniform(REGION[0], REGION[2]), rng.uniform(REGION[1], REGION[3]), 7) for _ in range(batch)]
+    hours = [rng.randrange(24) for _ in range(batch)]
+    grid.lookup(pts, hours)  # warm the tile cache, as the processor would after its first batch
+    t0 = time.perf_counter()
+    for _ in range(lookups // batch):
+        grid.lookup(pts, hours)
+    elapsed = time.perf_counter() - t0
+    return {
+        "open_ms": round(open_ms, 3),
+        "batch": batch,
+        "lookup_us": round(elapsed * 1e6 / (lookups // batch * batch), 3),
+        "lookups_per_sec": round(lookups / elapsed, 1),
+    }
+
+
+def bench_dashboard(reps=20):
+    from src.dashboard import queries
+
+    calls = {
+        "vehicles": lambda: queries.load_vehicles(1),
+        "latest_quote": lambda: queries.load_latest_quote(1, None),
+        "latest_quote_vehicle": lambda: queries.load_latest_quote(1, 1),
+        "recent_trips": lambda: queries.load_recent_trips(1, None, limit=50),
+        "rewards": lambda: queries.load_rewards(1),
+        "leaderboard": lambda: queries.load_leaderboard(),
+    }
+    out = {}
+    for name, fn in calls.items():
+        times = []
+        for _ in range(reps):
+            t0 = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - t0) * 1000)
+        out[f"{name}_ms"] = round(statistics.median(times), 3)
+    return out
+
+
+def bench_api(requests_total=2000, concurrency=16):
+    port = free_port()
+    env = os.environ.copy()
+    env["UBI_API_KEY"] = API_KEY
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=str(ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                urllib.request.urlopen(base + "/health", timeout=1).read()
+                break
+            except OSError:
+                if time.time() > deadline or proc.poll() is not None:
+                    return {"skipped": "API did not come up"}
+                time.sleep(0.1)
+
+        paths = ["/vehicles?user_id={u}", "/pricing/quote?user_id={u}", "/pricing/quote?user_id={u}&vehicle_id={v}", "/driver/summary?user_id={u}"]
+
+        def hit(i):
+            path = paths[i % len(paths)].format(u=1 + i % 5, v=1 + i % 10)
+            req = urllib.request.Request(base + path, headers={"x_api_key": API_KEY})
+            t0 = time.perf_counter()
+            urllib.request.urlopen(req, timeout=30).read()
+            return (time.perf_counter() - t0) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            lat = list(pool.map(hit, range(requests_total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "requests_per_sec": round(requests_total / elapsed, 1),
+        "p50_ms": round(pct(lat, 50), 2),
+        "p95_ms": round(pct(lat, 95), 2),
+        "p99_ms": round(pct(lat, 99), 2),
+    }
+
+
+def bench_model(train_rows=50_000, infer_rows=10_000):
+    try:
+        import pandas, sklearn  # noqa: F401  (train_model imports these lazily)
+    except ImportError as e:
+        return {"skipped": f"training deps missing ({e.name})"}
+    from src.models import train_model
+    from src.common.db import DB_PATH
+
+    t0 = time.perf_counter()
+    X, y, _ = train_model.load_dataframe(str(DB_PATH))
+    load_s = time.perf_counter() - t0
+    if len(X) > train_rows:
+        X = X.sample(train_rows, random_state=42)
+        y = y.loc[X.index]
+    t0 = time.perf_counter()
+    model, _, _ = train_model.train_and_calibrate(X, y)
+    train_s = time.perf_counter() - t0
+    Xi = X.iloc[:infer_rows]
+    t0 = time.perf_counter()
+    model.predict_proba(Xi)
+    infer_s = time.perf_counter() - t0
+    return {
+        "rows": len(X),
+        "load_seconds": round(load_s, 3),
+        "train_seconds": round(train_s, 3),
+        "infer_batch_ms": round(infer_s * 1000, 2),
+        "infer_per_row_us": round(infer_s * 1e6 / max(len(Xi), 1), 2),
+    }
+
+
+def run_worker(trips, args):
+    from src.common import db
+
+    from src.context import grid
+
+    random.seed(args.seed)
+    db.init()
+    grid.build(grid.GRID_PATH)
+    return {
+        "context": bench_context(),
+        "simulator": bench_simulator(trips),
+        "processor": bench_processor(),
+        "dashboard": bench_dashboard(),
+        "api": bench_api(args.requests, args.concurrency),
+        "model": bench_model(args.train_rows) if not args.skip_model else {"skipped": "--skip-model"},
+    }
+
+
+# --------------------------- orchestration --------------------------- #
+def run_size(trips, args):
+    tmp = Path(tempfile.mkdtemp(prefix="ubi_bench_"))
+    env = os.environ.copy()
+    env["UBI_DB_PATH"] = str(tmp / "ubi.db")
+    env["UBI_METRICS_CSV"] = str(tmp / "ops_metrics.csv")
+    env["UBI_INGEST_LOG"] = str(tmp / "ingest_log")
+    env["UBI_CONTEXT_GRID"] = str(tmp / "context_grid.bin")
+    out = tmp / "result.json"
+    cmd = [sys.executable, "-m", "src.bench.pipeline", "--worker", str(trips), "--worker-out", str(out),
+           "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+           "--train-rows", str(args.train_rows), "--seed", str(args.seed)]
+    if args.skip_model:
+        cmd.append("--skip-model")
+    try:
+        print(f"▶ bench {trips} trips (db: {env['UBI_DB_PATH']})", file=sys.stderr)
+        subprocess.check_call(cmd, cwd=str(ROOT), env=env)
+        return json.loads(out.read_text())
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_sec")
+
+
+def compare_stages(stages, base_stages, tolerance):
+    """Per-metric change vs. baseline; a metric regresses when it is
+    worse than the baseline by more than `tolerance` (fraction)."""
+    rows = {}
+    for stage, metrics in stages.items():
+        for metric, value in metrics.items():
+            old = base_stages.get(stage, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if metric in ("trips", "rows", "requests", "concurrency"):
+                continue
+            change = (value - old) / old
+            worse = -change if higher_is_better(metric) else change
+            rows[f"{stage}.{metric}"] = {
+                "baseline": old,
+                "current": value,
+                "change_pct": round(change * 100, 1),
+                "regressed": worse > tolerance,
+            }
+    return rows
+
+
+def compare(current, baseline, tolerance):
+    """Startup and per-size comparisons against a baseline result."""
+    out = {}
+    if current.get("startup") and baseline.get("startup"):
+        out["startup"] = compare_stages({"startup": current["startup"]}, {"startup": baseline["startup"]}, tolerance)
+    base_runs = baseline.get("runs", {})
+    for size, stages in current["runs"].items():
+        if base_runs.get(size):
+            out[size] = compare_stages(stages, base_runs[size], tolerance)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark simulator → processor → API/dashboard → model on a temp DB.")
+    ap.add_argument("--sizes", default="10k", help="comma-separated trip counts, e.g. 10k,1m,10m")
+    ap.add_argument("--out", default=str(DEFAULT_OUT), help="where to write the JSON results")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline JSON to compare against")
+    ap.add_argument("--save-baseline", action="store_true", help="also write these results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown vs. baseline (fraction)")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    ap.add_argument("--requests", type=int, default=2000, help="API requests per size")
+    ap.add_argument("--concurrency", type=int, default=16, help="concurrent API clients")
+    ap.add_argument("--train-rows", type=int, default=50_000, help="cap on rows used for model training")
+    ap.add_argument("--skip-model", action="store_true")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--worker-out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker is not None:
+        Path(args.worker_out).write_text(json.dumps(run_worker(args.worker, args)))
+        return
+
+    print("▶ bench service startup", file=sys.stderr)
+    startup = bench_startup()
+    runs = {str(n): run_size(n, args) for n in map(parse_size, args.sizes.split(","))}
+    result = {
+        "meta": {
+            "ts_utc": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": list(runs),
+        },
+        "startup": startup,
+        "runs": runs,
+    }
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists():
+        result["comparison"] = compare(result, json.loads(baseline_path.read_text()), args.tolerance)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+
+    regressions = [f"{size}:{m}" for size, rows in result.get("comparison", {}).items() for m, r in rows.items() if r["regressed"]]
+    if regressions:
+        print("⚠ regressions: " + ", ".join(regressions), file=sys.stderr)
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
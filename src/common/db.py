@@ -8,16 +8,52 @@ DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, display_name TEXT);
 CREATE TABLE IF NOT EXISTS vehicles (id INTEGER PRIMARY KEY, user_id INTEGER, make TEXT, model TEXT, year INTEGER, safety_rating REAL, base_rate REAL);
-CREATE TABLE IF NOT EXISTS trips (id TEXT PRIMARY KEY, user_id INTEGER, vehicle_id INTEGER, ts_utc TEXT, miles REAL, avg_speed REAL, max_speed REAL, harsh_brakes INTEGER, accel_var REAL, night_pct REAL, speeding_pct REAL, weather_risk REAL, processed INTEGER DEFAULT 0);
-CREATE TABLE IF NOT EXISTS quotes (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT, user_id INTEGER, vehicle_id INTEGER, base_component REAL, usage_component REAL, behavior_component REAL, context_component REAL, final_premium REAL, risk_score REAL, explanations TEXT);
+CREATE TABLE IF NOT EXISTS trips (id TEXT PRIMARY KEY, user_id INTEGER, vehicle_id INTEGER, ts_utc TEXT, miles REAL, avg_speed REAL, max_speed REAL, harsh_brakes INTEGER, accel_var REAL, night_pct REAL, speeding_pct REAL, weather_risk REAL, processed INTEGER DEFAULT 0, geohash TEXT, ctx_weather REAL, ctx_incident REAL, ctx_road REAL);
+CREATE TABLE IF NOT EXISTS quotes (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT, user_id INTEGER, vehicle_id INTEGER, base_component REAL, usage_component REAL, behavior_component REAL, context_component REAL, final_premium REAL, risk_score REAL, f_speeding_pct REAL, f_harsh_brakes INTEGER, f_night_pct REAL, f_weather_risk REAL);
 CREATE TABLE IF NOT EXISTS rewards (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT, user_id INTEGER, points INTEGER, reason TEXT, trip_id TEXT);
+CREATE TABLE IF NOT EXISTS badges (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT, user_id INTEGER, badge TEXT, trip_id TEXT);
+CREATE TABLE IF NOT EXISTS achievement_progress (user_id INTEGER, badge TEXT, progress REAL, marker INTEGER, PRIMARY KEY (user_id, badge)) WITHOUT ROWID;
 CREATE TABLE IF NOT EXISTS driver_summary (user_id INTEGER PRIMARY KEY, display_name TEXT, points INTEGER DEFAULT 0, badges INTEGER DEFAULT 0, risk_score REAL DEFAULT 50.0);
 """
 
+# explanation factors stored as quote columns (v1) instead of a JSON `explanations` string (v0)
+EXPLANATION_FACTORS = ["speeding_pct", "harsh_brakes", "night_pct", "weather_risk"]
+
+def migrate(con):
+    """Bring an existing DB up to the current schema; tracked via PRAGMA user_version."""
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        cols = {r[1] for r in con.execute("PRAGMA table_info(quotes)")}
+        if "explanations" in cols:
+            for f in EXPLANATION_FACTORS:
+                if f"f_{f}" not in cols:
+                    con.execute(f"ALTER TABLE quotes ADD COLUMN f_{f} {'INTEGER' if f == 'harsh_brakes' else 'REAL'}")
+            con.execute("UPDATE quotes SET " + ", ".join(
+                f"f_{f}=json_extract(explanations, '$.factors.{f}')" for f in EXPLANATION_FACTORS
+            ) + " WHERE explanations IS NOT NULL")
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                con.execute("ALTER TABLE quotes DROP COLUMN explanations")
+            else:
+                con.execute("UPDATE quotes SET explanations=NULL")
+        con.execute("PRAGMA user_version=1")
+        con.commit()
+        if "explanations" in cols:
+            con.execute("VACUUM")
+    if version < 2:
+        # trip start location (geohash) for the context grid lookup, and the factors it returned
+        # (kept apart from the device-reported weather_risk)
+        cols = {r[1] for r in con.execute("PRAGMA table_info(trips)")}
+        for col, typ in (("geohash", "TEXT"), ("ctx_weather", "REAL"), ("ctx_incident", "REAL"), ("ctx_road", "REAL")):
+            if col not in cols:
+                con.execute(f"ALTER TABLE trips ADD COLUMN {col} {typ}")
+        con.execute("PRAGMA user_version=2")
+        con.commit()
+
 def init():
     con = sqlite3.connect(str(DB_PATH))
     cur = con.cursor()
     cur.executescript(SCHEMA)
+    migrate(con)
     cur.execute("SELECT COUNT(*) FROM users")
     if cur.fetchone()[0] == 0:
         for u in range(1, 6):
@@ -35,6 +71,24 @@ def init():
     con.commit()
     con.close()
 
+def storage_report(con, tables=("quotes", "rewards", "trips")):
+    """On-disk bytes per table (via the dbstat virtual table) and per processed trip."""
+    trips = con.execute("SELECT COUNT(*) FROM trips WHERE processed=1").fetchone()[0]
+    out = {"processed_trips": trips}
+    for t in tables:
+        try:
+            size = con.execute("SELECT COALESCE(SUM(pgsize),0) FROM dbstat WHERE name=?", (t,)).fetchone()[0]
+        except sqlite3.OperationalError:  # sqlite built without SQLITE_ENABLE_DBSTAT_VTAB
+            return out
+        rows = con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+        out[t] = {"rows": rows, "bytes": size, "bytes_per_trip": round(size / trips, 1) if trips else None}
+    return out
+
 if __name__ == "__main__":
+    import sys, json
     init()
     print(f"Initialized DB at {DB_PATH}")
+    if "--report" in sys.argv[1:]:
+        con = sqlite3.connect(str(DB_PATH))
+        print(json.dumps(storage_report(con), indent=2))
+        con.close()
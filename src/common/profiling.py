@@ -0,0 +1,206 @@
+import os, sys, time, sqlite3, threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Opt-in profiling helpers shared by the processor and the API. Nothing here is active
+# unless a caller turns it on, so the disabled cost is a boolean check.
+
+PROFILE_DIR = Path(os.environ.get("UBI_PROFILE_DIR", "data/profiles"))
+
+def profile_path(prefix, suffix):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    return PROFILE_DIR / f"{prefix}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}{suffix}"
+
+# --------------------------- SQL statement timing --------------------------- #
+class SqlStats:
+    """Wall time per SQL statement (whitespace-normalized text), including row fetches."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: [0, 0.0])
+
+    def add(self, sql, seconds, calls=1):
+        key = " ".join(sql.split())
+        with self._lock:
+            s = self._stats[key]
+            s[0] += calls
+            s[1] += seconds
+
+    def report(self):
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda kv: kv[1][1], reverse=True)
+        return [{"sql": sql, "calls": n, "total_ms": round(t * 1000, 3), "avg_ms": round(t * 1000 / max(n, 1), 4)}
+                for sql, (n, t) in items]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+SQL_STATS = SqlStats()
+
+class TimedCursor(sqlite3.Cursor):
+    _sql = ""
+
+    def execute(self, sql, params=()):
+        self._sql = sql
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            SQL_STATS.add(sql, time.perf_counter() - t0)
+
+    def executemany(self, sql, seq):
+        self._sql = sql
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            SQL_STATS.add(sql, time.perf_counter() - t0)
+
+    # SELECTs step most rows during fetch; charge that to the statement that produced them
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            SQL_STATS.add(self._sql, time.perf_counter() - t0, calls=0)
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            SQL_STATS.add(self._sql, time.perf_counter() - t0, calls=0)
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+def connect(path):
+    """sqlite3.connect, with per-statement timing when SQL_STATS is enabled."""
+    if SQL_STATS.enabled:
+        return sqlite3.connect(str(path), factory=TimedConnection)
+    return sqlite3.connect(str(path))
+
+# --------------------------- sampling profiler --------------------------- #
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+class StackSampler:
+    """Samples Python stacks of other threads every `interval` seconds and aggregates them as
+    collapsed stacks ("outer;inner;leaf count"), the input format of flamegraph.pl/speedscope.
+    Threads parked in threading/selectors/queue waits are skipped as idle."""
+
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me or (self.thread_ids and tid not in self.thread_ids):
+                    continue
+                if frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.counts.most_common())
+
+# --------------------------- request profiling (API) --------------------------- #
+class RequestProfiler:
+    """Profiles the next N requests: samples stacks while any of them is in flight and times SQL,
+    then writes <prefix>-*.collapsed / *.sql.txt under PROFILE_DIR.
+    State is per process: with several uvicorn workers, arm() only reaches the worker that handled
+    it, and captures are read back from PROFILE_DIR (latest()) rather than from memory."""
+
+    def __init__(self, prefix="api"):
+        self.prefix = prefix
+        self.remaining = 0
+        self.in_flight = 0
+        self.sampler = None
+        # begin/end run on the event loop, arm on a threadpool thread (sync endpoint) or at import
+        self._lock = threading.Lock()
+
+    def arm(self, n):
+        with self._lock:
+            self.remaining = max(0, int(n))
+            if self.remaining and self.sampler is None:
+                SQL_STATS.reset()
+                SQL_STATS.enabled = True
+                self.sampler = StackSampler().start()
+            elif not self.remaining and not self.in_flight:
+                self._finish()  # disarmed mid-capture: keep what was sampled, stop sampling and SQL timing
+            return self.remaining
+
+    def begin(self):
+        with self._lock:
+            self.remaining -= 1
+            self.in_flight += 1
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+            if self.remaining <= 0 and self.in_flight <= 0:
+                self._finish()
+
+    def _finish(self):
+        # caller holds the lock; only the first caller finds a sampler to finish
+        if self.sampler is None:
+            return
+        sampler, self.sampler = self.sampler, None
+        SQL_STATS.enabled = False
+        sql = SQL_STATS.report()
+        # stopping the sampler joins its thread and the writes hit disk: keep both off the event loop
+        threading.Thread(target=self._write, args=(sampler, sql), name="profile-writer").start()
+
+    def _write(self, sampler, sql):
+        sampler.stop()
+        path = profile_path(self.prefix, ".collapsed")
+        path.write_text(sampler.collapsed() + "\n", encoding="utf-8")
+        path.with_suffix(".sql.txt").write_text(format_sql_report(sql), encoding="utf-8")
+
+    def latest(self):
+        """Newest capture on disk from any process sharing PROFILE_DIR, or None."""
+        paths = sorted(PROFILE_DIR.glob(f"{self.prefix}-*.collapsed"), key=lambda p: p.stat().st_mtime)
+        if not paths:
+            return None
+        path = paths[-1]
+        collapsed = path.read_text(encoding="utf-8").strip()
+        sql = path.with_suffix(".sql.txt")
+        return {"path": str(path), "samples": sum(int(line.rsplit(" ", 1)[1]) for line in collapsed.splitlines()),
+                "collapsed": collapsed, "sql": sql.read_text(encoding="utf-8") if sql.exists() else ""}
+
+def format_sql_report(rows):
+    lines = [f"{'total_ms':>10} {'calls':>7} {'avg_ms':>9}  sql"]
+    lines += [f"{r['total_ms']:>10.2f} {r['calls']:>7} {r['avg_ms']:>9.4f}  {r['sql']}" for r in rows]
+    return "\n".join(lines) + "\n"
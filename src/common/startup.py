@@ -0,0 +1,25 @@
+import os, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# dev.py stamps UBI_LAUNCH_TS (epoch seconds) into each child's env right before spawning it
+_reported = set()
+
+def report_ready(service, launched=None, log=None):
+    """Print (and optionally log) how long `service` took from spawn to ready. No-op without UBI_LAUNCH_TS.
+    `launched`/`log` default to UBI_LAUNCH_TS/UBI_STARTUP_LOG, for callers reporting on another process."""
+    launched = launched or os.environ.get("UBI_LAUNCH_TS")
+    if not launched or service in _reported:
+        return None
+    _reported.add(service)
+    ms = (time.time() - float(launched)) * 1000
+    print(f"⏱ {service} ready in {ms:.0f} ms", flush=True)
+    log = log or os.environ.get("UBI_STARTUP_LOG")
+    if log:
+        p = Path(log)
+        new = not p.exists()
+        with open(p, "a", encoding="utf-8") as f:
+            if new:
+                f.write("ts_utc,service,startup_ms\n")
+            f.write(f"{datetime.now(timezone.utc).isoformat()},{service},{ms:.1f}\n")
+    return ms
@@ -0,0 +1,150 @@
+# src/context/grid.py
+# Spatio-temporal context: (geohash, UTC hour) -> (weather, incident, road_risk), each 0..1.
+# Usage:
+#   python -m src.context.grid --out data/context_grid.bin              # synthetic grid for the simulator region
+#   python -m src.context.grid --out data/context_grid.bin --csv ctx.csv # from a feed export: geohash,hour,weather,incident,road
+#
+# File layout (little-endian), read through a numpy memmap:
+#   magic "UBICTX2\0" | n_tiles u32 | reserved u32
+#   tile keys  u32[n_tiles]   sorted geohash-4 prefixes (to_int)
+#   tile data  u8[n_tiles, 32, 24, 3]   32 geohash-5 cells x 24 hours x factors, quantized /254;
+#                                      255 marks a (cell, hour) the feed did not supply
+# A lookup is a binary search over tile keys plus one array index; decoded tiles sit in an LRU cache.
+
+from __future__ import annotations
+import argparse
+import csv
+import math
+import os
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from src.context import geohash
+
+GRID_PATH = Path(os.environ.get("UBI_CONTEXT_GRID", "data/context_grid.bin"))
+TILE_CACHE = int(os.environ.get("UBI_CONTEXT_TILE_CACHE", "256"))
+MAGIC = b"UBICTX2\0"
+SCALE = 254.0
+MISSING = 255
+HEADER_BYTES = 16
+TILE_PRECISION, CELL_PRECISION = 4, 5
+CELLS, HOURS = 32, 24
+FACTORS = ("weather", "incident", "road")
+
+# simulator region (greater Los Angeles) and its offset from UTC, used by the synthetic builder
+REGION = (33.6, -118.7, 34.5, -117.8)
+REGION_UTC_OFFSET = -8
+
+
+class ContextGrid:
+    def __init__(self, path=GRID_PATH, tile_cache=TILE_CACHE):
+        self.path = Path(path)
+        mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(mm[:8]) != MAGIC:
+            raise ValueError(f"{self.path} is not a context grid file")
+        n = int(np.frombuffer(mm, dtype="<u4", count=1, offset=8)[0])
+        self.keys = np.frombuffer(mm, dtype="<u4", count=n, offset=HEADER_BYTES)
+        self.data = mm[HEADER_BYTES + 4 * n:].reshape(n, CELLS, HOURS, len(FACTORS))
+        self._tile = lru_cache(maxsize=tile_cache)(self._load_tile)
+
+    def _load_tile(self, i):
+        raw = self.data[i]
+        tile = raw.astype(np.float32) / SCALE
+        tile[(raw == MISSING).any(axis=-1)] = np.nan
+        return tile
+
+    def lookup(self, geohashes, hours):
+        """Vectorized: returns float32[n, 3] (weather, incident, road); NaN rows where no tile covers the point
+        or the feed had no data for that cell and hour."""
+        cells = np.fromiter((geohash.to_int(g[:CELL_PRECISION]) if g and len(g) >= CELL_PRECISION else -1 for g in geohashes),
+                            dtype=np.int64, count=len(geohashes))
+        hours = np.asarray(hours, dtype=np.int64) % HOURS
+        out = np.full((len(cells), len(FACTORS)), np.nan, dtype=np.float32)
+        if not len(self.keys):
+            return out
+        tiles = cells >> 5
+        pos = np.minimum(np.searchsorted(self.keys, tiles), len(self.keys) - 1)
+        hit = (cells >= 0) & (self.keys[pos] == tiles)
+        for i in np.unique(pos[hit]):
+            m = hit & (pos == i)
+            out[m] = self._tile(int(i))[cells[m] & 31, hours[m]]
+        return out
+
+
+def synthetic_factors(gh5, hour_utc, utc_offset=REGION_UTC_OFFSET):
+    """Deterministic stand-in for real feeds: denser/riskier roads near the center,
+    incidents peaking at local rush hours, morning fog and evening weather bands."""
+    lat, lon = geohash.decode(gh5)
+    clat, clon = (REGION[0] + REGION[2]) / 2, (REGION[1] + REGION[3]) / 2
+    noise = (zlib.crc32(gh5.encode()) % 1000) / 1000.0
+    urban = math.exp(-(((lat - clat) / 0.25) ** 2 + ((lon - clon) / 0.3) ** 2))
+    road = 0.15 + 0.6 * urban + 0.25 * noise
+    local = (hour_utc + utc_offset) % 24
+    rush = math.exp(-((local - 8) / 1.5) ** 2) + math.exp(-((local - 17.5) / 2.0) ** 2)
+    incident = 0.05 + 0.55 * rush * (0.4 + 0.6 * urban) + 0.1 * noise
+    fog = math.exp(-((local - 6.5) / 2.0) ** 2) * (0.5 + 0.5 * math.sin(lon * 7.0))
+    weather = 0.1 + 0.5 * fog + 0.2 * (0.5 + 0.5 * math.sin(lat * 11.0 + local / 4.0)) + 0.1 * noise
+    return tuple(min(1.0, max(0.0, v)) for v in (weather, incident, road))
+
+
+def region_tiles(region=REGION):
+    lat0, lon0, lat1, lon1 = region
+    step = 0.1  # well under a geohash-4 tile (~0.18 x 0.35 deg)
+    tiles = set()
+    lat = lat0
+    while lat <= lat1 + step:
+        lon = lon0
+        while lon <= lon1 + step:
+            tiles.add(geohash.encode(min(lat, lat1), min(lon, lon1), TILE_PRECISION))
+            lon += step
+        lat += step
+    return sorted(tiles, key=geohash.to_int)
+
+
+def build(out=GRID_PATH, csv_path=None, region=REGION):
+    if csv_path:
+        rows = {}
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                rows[(r["geohash"][:CELL_PRECISION], int(r["hour"]) % HOURS)] = tuple(float(r[k]) for k in FACTORS)
+        tiles = sorted({gh[:TILE_PRECISION] for gh, _ in rows}, key=geohash.to_int)
+        factors = lambda gh5, h: rows.get((gh5, h))
+    else:
+        tiles = region_tiles(region)
+        factors = synthetic_factors
+
+    data = np.full((len(tiles), CELLS, HOURS, len(FACTORS)), MISSING, dtype=np.uint8)
+    for t, tile in enumerate(tiles):
+        for c in range(CELLS):
+            gh5 = tile + geohash.BASE32[c]
+            for h in range(HOURS):
+                f = factors(gh5, h)
+                if f is not None:
+                    data[t, c, h] = np.round(np.clip(f, 0.0, 1.0) * SCALE)
+
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.array([len(tiles), 0], dtype="<u4").tobytes())
+        f.write(np.array([geohash.to_int(t) for t in tiles], dtype="<u4").tobytes())
+        f.write(data.tobytes())
+    os.replace(tmp, out)
+    return out, len(tiles)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the memory-mapped (geohash, hour) context grid.")
+    ap.add_argument("--out", default=str(GRID_PATH))
+    ap.add_argument("--csv", help="geohash,hour,weather,incident,road rows (hour in UTC, factors 0..1)")
+    args = ap.parse_args()
+    out, n = build(args.out, args.csv)
+    print(f"Wrote {n} tiles to {out} ({out.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
 from datetime import datetime, timezone
 from pathlib import Path
-import os
-import sqlite3
 import pandas as pd
 import streamlit as st
 
@@ -14,6 +12,14 @@ try:
         chart_api_lat,
         chart_queue,
     )
+    from .queries import (
+        load_vehicles,
+        load_latest_quote,
+        load_recent_trips,
+        load_rewards,
+        load_badges,
+        load_leaderboard,
+    )
 except Exception:
     import sys
     PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -26,96 +32,18 @@ except Exception:
         chart_api_lat,
         chart_queue,
     )
+    from src.dashboard.queries import (
+        load_vehicles,
+        load_latest_quote,
+        load_recent_trips,
+        load_rewards,
+        load_badges,
+        load_leaderboard,
+    )
 
 st.set_page_config(page_title="Telematics UBI Pro", layout="wide")
 st.title("Telematics UBI Pro — Dashboard")
 
-DB_PATH = Path(os.environ.get("UBI_DB_PATH", "data/ubi.db"))
-
-# --------------------------- DB helpers --------------------------- #
-def read_sql(sql: str, params: tuple = ()):
-    """Simple SQLite reader that returns a pandas DataFrame or empty DF."""
-    if not DB_PATH.exists():
-        return pd.DataFrame()
-    con = sqlite3.connect(str(DB_PATH))
-    try:
-        return pd.read_sql(sql, con, params=params)
-    finally:
-        con.close()
-
-def load_vehicles(user_id: int) -> pd.DataFrame:
-    return read_sql(
-        """
-        SELECT id, make, model, year, safety_rating, base_rate
-        FROM vehicles
-        WHERE user_id = ?
-        ORDER BY id
-        """,
-        (user_id,),
-    )
-
-def load_latest_quote(user_id: int, vehicle_id: int | None) -> pd.DataFrame:
-    if vehicle_id:
-        return read_sql(
-            """
-            SELECT created_at, base_component, usage_component, behavior_component,
-                   context_component, final_premium, risk_score
-            FROM quotes
-            WHERE user_id = ? AND vehicle_id = ?
-            ORDER BY created_at DESC
-            LIMIT 1
-            """,
-            (user_id, vehicle_id),
-        )
-    # fall back to latest for any vehicle
-    return read_sql(
-        """
-        SELECT created_at, base_component, usage_component, behavior_component,
-               context_component, final_premium, risk_score
-        FROM quotes
-        WHERE user_id = ?
-        ORDER BY created_at DESC
-        LIMIT 1
-        """,
-        (user_id,),
-    )
-
-def load_recent_trips(user_id: int, vehicle_id: int | None, limit: int = 20) -> pd.DataFrame:
-    """Last N trips (newest first). If vehicle_id is None, show trips for all vehicles of the user."""
-    base_select = """
-        SELECT
-          id AS trip_id,
-          ts_utc,
-          vehicle_id,
-          miles,
-          avg_speed,
-          max_speed,
-          harsh_brakes,
-          speeding_pct,
-          night_pct,
-          weather_risk
-        FROM trips
-    """
-    if vehicle_id:
-        return read_sql(
-            base_select
-            + f"""
-            WHERE user_id = ? AND vehicle_id = ?
-            ORDER BY ts_utc DESC
-            LIMIT {int(limit)}
-            """,
-            (user_id, vehicle_id),
-        )
-    return read_sql(
-        base_select
-        + f"""
-        WHERE user_id = ?
-        ORDER BY ts_utc DESC
-        LIMIT {int(limit)}
-        """,
-        (user_id,),
-    )
-
 # --------------------------- UI --------------------------- #
 tab_overview, tab_vehicles, tab_rewards, tab_leaderboard, tab_ops = st.tabs(
     ["Overview", "Vehicles", "Achievements", "Leaderboard", "Ops (Labeled Metrics)"]
@@ -208,17 +136,15 @@ with tab_vehicles:
 
 # --------------------------- Achievements --------------------------- #
 with tab_rewards:
+    st.subheader("Badges")
+    bdf = load_badges(user_id)
+    if bdf.empty:
+        st.info("No badges yet — e.g. 10 trips in a row without a harsh brake.")
+    else:
+        st.dataframe(bdf, width="stretch", hide_index=True)
+
     st.subheader("Recent Rewards")
-    rdf = read_sql(
-        """
-        SELECT created_at, points, reason, trip_id
-        FROM rewards
-        WHERE user_id = ?
-        ORDER BY created_at DESC
-        LIMIT 50
-        """,
-        (user_id,),
-    )
+    rdf = load_rewards(user_id)
     if rdf.empty:
         st.info("No rewards yet.")
     else:
@@ -227,15 +153,7 @@ with tab_rewards:
 # --------------------------- Leaderboard --------------------------- #
 with tab_leaderboard:
     st.subheader("Leaderboard")
-    ldf = read_sql(
-        """
-        SELECT user_id, display_name, points, badges,
-               (100 - risk_score) AS safety_index
-        FROM driver_summary
-        ORDER BY points DESC, safety_index DESC
-        LIMIT 10
-        """
-    )
+    ldf = load_leaderboard()
     st.dataframe(ldf, width="stretch", hide_index=True)
 
 # --------------------------- Ops --------------------------- #
@@ -0,0 +1,124 @@
+from pathlib import Path
+import os
+import sqlite3
+import pandas as pd
+
+DB_PATH = Path(os.environ.get("UBI_DB_PATH", "data/ubi.db"))
+
+# --------------------------- DB helpers --------------------------- #
+def read_sql(sql: str, params: tuple = ()):
+    """Simple SQLite reader that returns a pandas DataFrame or empty DF."""
+    if not DB_PATH.exists():
+        return pd.DataFrame()
+    con = sqlite3.connect(str(DB_PATH))
+    try:
+        return pd.read_sql(sql, con, params=params)
+    finally:
+        con.close()
+
+def load_vehicles(user_id: int) -> pd.DataFrame:
+    return read_sql(
+        """
+        SELECT id, make, model, year, safety_rating, base_rate
+        FROM vehicles
+        WHERE user_id = ?
+        ORDER BY id
+        """,
+        (user_id,),
+    )
+
+def load_latest_quote(user_id: int, vehicle_id: int | None) -> pd.DataFrame:
+    if vehicle_id:
+        return read_sql(
+            """
+            SELECT created_at, base_component, usage_component, behavior_component,
+                   context_component, final_premium, risk_score
+            FROM quotes
+            WHERE user_id = ? AND vehicle_id = ?
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (user_id, vehicle_id),
+        )
+    # fall back to latest for any vehicle
+    return read_sql(
+        """
+        SELECT created_at, base_component, usage_component, behavior_component,
+               context_component, final_premium, risk_score
+        FROM quotes
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT 1
+        """,
+        (user_id,),
+    )
+
+def load_recent_trips(user_id: int, vehicle_id: int | None, limit: int = 20) -> pd.DataFrame:
+    """Last N trips (newest first). If vehicle_id is None, show trips for all vehicles of the user."""
+    base_select = """
+        SELECT
+          id AS trip_id,
+          ts_utc,
+          vehicle_id,
+          miles,
+          avg_speed,
+          max_speed,
+          harsh_brakes,
+          speeding_pct,
+          night_pct,
+          weather_risk
+        FROM trips
+    """
+    if vehicle_id:
+        return read_sql(
+            base_select
+            + f"""
+            WHERE user_id = ? AND vehicle_id = ?
+            ORDER BY ts_utc DESC
+            LIMIT {int(limit)}
+            """,
+            (user_id, vehicle_id),
+        )
+    return read_sql(
+        base_select
+        + f"""
+        WHERE user_id = ?
+        ORDER BY ts_utc DESC
+        LIMIT {int(limit)}
+        """,
+        (user_id,),
+    )
+
+def load_rewards(user_id: int, limit: int = 50) -> pd.DataFrame:
+    return read_sql(
+        f"""
+        SELECT created_at, points, reason, trip_id
+        FROM rewards
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT {int(limit)}
+        """,
+        (user_id,),
+    )
+
+def load_badges(user_id: int) -> pd.DataFrame:
+    return read_sql(
+        """
+        SELECT created_at, badge, trip_id
+        FROM badges
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        """,
+        (user_id,),
+    )
+
+def load_leaderboard(limit: int = 10) -> pd.DataFrame:
+    return read_sql(
+        f"""
+        SELECT user_id, display_name, points, badges,
+               (100 - risk_score) AS safety_index
+        FROM driver_summary
+        ORDER BY points DESC, safety_index DESC
+        LIMIT {int(limit)}
+        """
+    )
@@ -0,0 +1,294 @@
+import os, mmap, struct, time, zlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Segmented append-only log used as the ingest buffer between producers and the processor.
+# Each producer appends to its own shard, LOG_DIR/p<N>/ (open_writer takes the first one no other
+# process holds); ShardedConsumer merges them. A shard directory looks like:
+#
+#   <dir>/<base_seq:020d>.seg   fixed-size, preallocated segment; records are [len u32][crc32 u32][payload]
+#   <dir>/head                  "next_seq base pos" — written after each fsync, so everything below
+#                               next_seq is durable; consumers never read past it
+#   <dir>/<consumer>.offset     "seq base pos" — next record the consumer has not committed
+#
+# Offsets are record sequence numbers, so lag is head - committed offset (summed over shards).
+
+LOG_DIR = Path(os.environ.get("UBI_INGEST_LOG", "data/ingest_log"))
+SEGMENT_BYTES = int(os.environ.get("UBI_LOG_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+HEADER = struct.Struct("<II")
+
+def _seg_path(d, base):
+    return d / f"{base:020d}.seg"
+
+def _segments(d):
+    return sorted(int(p.stem) for p in d.glob("*.seg"))
+
+def _read_triple(path, default=(0, 0, 0)):
+    try:
+        return tuple(int(x) for x in path.read_text().split())
+    except (FileNotFoundError, ValueError):
+        return default
+
+def _write_triple(path, triple):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(" ".join(map(str, triple)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class ShardBusy(RuntimeError):
+    pass
+
+def _try_lock(f):
+    """Non-blocking exclusive lock on an open file, released when it is closed; OSError if held."""
+    if fcntl:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+class LogWriter:
+    """Single producer per directory, held with a file lock. Appends are buffered by the OS and fsync'd
+    every `fsync_every` records or `fsync_interval` seconds (and on flush/close); only then do they
+    become visible."""
+
+    def __init__(self, d=LOG_DIR, segment_bytes=SEGMENT_BYTES, fsync_every=256, fsync_interval=0.2):
+        self.dir = Path(d)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = open(self.dir / "writer.lock", "a")  # "a": never truncate a file another writer has locked
+        try:
+            _try_lock(self._lock)
+        except OSError:
+            self._lock.close()
+            raise ShardBusy(f"another producer is writing to {self.dir}")
+        # resume at the last durable position; anything written after it was never acknowledged
+        self.seq, self.base, self.pos = _read_triple(self.dir / "head")
+        self._f = None
+        self._open_segment(self.base, self.pos)
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def _open_segment(self, base, pos):
+        if self._f:
+            self._f.close()
+        path = _seg_path(self.dir, base)
+        if not path.exists():
+            with open(path, "wb") as f:
+                f.truncate(self.segment_bytes)
+        self._f = open(path, "r+b")
+        self.base, self.pos = base, pos
+        self._end_marker()  # clear any torn record left past the durable head
+
+    def _end_marker(self):
+        # a zero header tells consumers the rest of the segment is unused
+        if self.pos + HEADER.size <= self.segment_bytes:
+            self._f.seek(self.pos)
+            self._f.write(HEADER.pack(0, 0))
+            self._f.seek(self.pos)
+
+    def append(self, payload: bytes):
+        need = HEADER.size + len(payload)
+        if need > self.segment_bytes:
+            raise ValueError(f"record of {len(payload)} bytes does not fit a {self.segment_bytes}-byte segment")
+        if self.pos + need > self.segment_bytes:
+            self._end_marker()
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._open_segment(self.seq, 0)
+        self._f.write(HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._f.write(payload)
+        self.pos += need
+        self.seq += 1
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.time() - self._last_sync >= self.fsync_interval:
+            self.flush()
+        return self.seq - 1
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        _write_triple(self.dir / "head", (self.seq, self.base, self.pos))
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        self.flush()
+        self._f.close()
+        self._lock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_writer(d=LOG_DIR, max_shards=64, **kw):
+    """LogWriter on the first shard <d>/p<N> that no other producer holds, so several producer
+    processes can append at once. Shards are reused by later producers, so their number stays
+    at the peak concurrency."""
+    for i in range(max_shards):
+        try:
+            return LogWriter(Path(d) / f"p{i}", **kw)
+        except ShardBusy:
+            continue
+    raise RuntimeError(f"all {max_shards} ingest log shards under {d} are in use")
+
+class LogConsumer:
+    """Reads durable records through read-only mmaps of the segments and tracks a committed offset.
+    A consumer without an offset starts at the oldest retained segment (or at head with
+    start="latest") and registers that offset right away, so segment cleanup keeps its records."""
+
+    def __init__(self, name, d=LOG_DIR, start="earliest"):
+        self.dir = Path(d)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.offset_path = self.dir / f"{name}.offset"
+        offset = _read_triple(self.offset_path, None)
+        if offset is None:
+            offset = self._initial_offset(start)
+            _write_triple(self.offset_path, offset)
+        self.seq, self.base, self.pos = offset
+        self._committed = self.seq
+        self._mm = None
+        self._mm_base = None
+
+    def _initial_offset(self, start):
+        head = _read_triple(self.dir / "head")
+        bases = _segments(self.dir)
+        if start == "latest" or not bases:
+            return head
+        return (bases[0], bases[0], 0)
+
+    def head(self):
+        return _read_triple(self.dir / "head")[0]
+
+    def lag(self):
+        return max(0, self.head() - self._committed)
+
+    def _map(self, base):
+        if self._mm_base == base:
+            return self._mm
+        if self._mm:
+            self._mm.close()
+        with open(_seg_path(self.dir, base), "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mm_base = base
+        return self._mm
+
+    def read(self, limit=1000):
+        """Up to `limit` payloads after the current position (not yet committed)."""
+        head = self.head()
+        out = []
+        while self.seq < head and len(out) < limit:
+            mm = self._map(self.base)
+            length = 0
+            if self.pos + HEADER.size <= len(mm):
+                length, crc = HEADER.unpack_from(mm, self.pos)
+            if length == 0:  # end of this segment; the next one starts at our seq
+                self.base, self.pos = self.seq, 0
+                continue
+            start = self.pos + HEADER.size
+            payload = mm[start:start + length]
+            if zlib.crc32(payload) != crc:
+                raise IOError(f"corrupt record {self.seq} in segment {self.base}")
+            out.append(payload)
+            self.pos = start + length
+            self.seq += 1
+        return out
+
+    def commit(self):
+        """Persist the position after the last read; call once the records are safely stored downstream."""
+        if self.seq == self._committed:
+            return
+        _write_triple(self.offset_path, (self.seq, self.base, self.pos))
+        self._committed = self.seq
+        self._drop_consumed_segments()
+
+    def _drop_consumed_segments(self):
+        low = min(_read_triple(p)[0] for p in self.dir.glob("*.offset"))
+        bases = _segments(self.dir)
+        for base, nxt in zip(bases, bases[1:]):
+            if nxt > low:
+                break
+            if base != self._mm_base:
+                _seg_path(self.dir, base).unlink(missing_ok=True)
+
+    def close(self):
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+            self._mm_base = None
+
+class ShardedConsumer:
+    """A LogConsumer (same name) per producer shard under `d`, picking up new shards as they appear.
+    Reads rotate the starting shard so one busy producer cannot starve the others."""
+
+    def __init__(self, name, d=LOG_DIR, start="earliest"):
+        self.name = name
+        self.dir = Path(d)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._start = start
+        self._shards = {}
+        self._turn = 0
+        self._discover()
+        self._start = "earliest"  # shards created after this point are new producers: read them from the start
+
+    def _discover(self):
+        for sd in sorted(p for p in self.dir.iterdir() if p.is_dir()):
+            if sd not in self._shards:
+                self._shards[sd] = LogConsumer(self.name, sd, self._start)
+
+    def lag(self):
+        return sum(c.lag() for c in self._shards.values())
+
+    def read(self, limit=1000):
+        self._discover()
+        shards = list(self._shards.values())
+        self._turn = (self._turn + 1) % max(len(shards), 1)
+        out = []
+        for c in shards[self._turn:] + shards[:self._turn]:
+            if len(out) >= limit:
+                break
+            out += c.read(limit - len(out))
+        return out
+
+    def commit(self):
+        for c in self._shards.values():
+            c.commit()
+
+    def close(self):
+        for c in self._shards.values():
+            c.close()
+
+# --------------------------- trip codec --------------------------- #
+# (id, user_id, vehicle_id, ts_utc, miles, avg_speed, max_speed, harsh_brakes, accel_var, night_pct, speeding_pct, weather_risk[, geohash])
+# geohash is a trailing optional field, so records written before it existed still decode (as None).
+TRIP = struct.Struct("<iidddidddd")
+
+def encode_trip(row):
+    tid, uid, vid, ts, *nums = row[:12]
+    tid_b, ts_b = tid.encode(), ts.encode()
+    out = struct.pack("<BB", len(tid_b), len(ts_b)) + tid_b + ts_b + TRIP.pack(uid, vid, *nums)
+    if len(row) > 12 and row[12]:
+        gh = row[12].encode()
+        out += struct.pack("<B", len(gh)) + gh
+    return out
+
+def decode_trip(buf):
+    n_id, n_ts = buf[0], buf[1]
+    tid = buf[2:2 + n_id].decode()
+    ts = buf[2 + n_id:2 + n_id + n_ts].decode()
+    off = 2 + n_id + n_ts
+    uid, vid, *nums = TRIP.unpack_from(buf, off)
+    off += TRIP.size
+    gh = buf[off + 1:off + 1 + buf[off]].decode() if len(buf) > off else None
+    return (tid, uid, vid, ts, *nums, gh)
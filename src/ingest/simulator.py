@@ -3,7 +3,18 @@ import os, sqlite3, random, time, argparse, string
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    from src.common.startup import report_ready
+except ImportError:  # run as a script: python src/<pkg>/<module>.py
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.common.startup import report_ready
+from src.ingest.ingest_log import open_writer, encode_trip
+from src.context import geohash
+
 DB_PATH = Path(os.environ.get("UBI_DB_PATH", "data/ubi.db"))
+# drivers live around central LA; trips start within a few km of home
+CENTER, HOME_SPREAD, TRIP_SPREAD = (34.05, -118.25), 0.3, 0.05
 
 def rid(prefix="T"):
     return prefix + "".join(random.choices(string.ascii_uppercase + string.digits, k=10))
@@ -17,9 +28,12 @@ def simulate_trip(user_id, vehicle_id):
     night_pct = round(random.uniform(0, 70), 1)
     speeding_pct = round(max(0, (max_speed-65) * random.uniform(0.2, 1.0)), 1)
     weather_risk = round(random.uniform(0, 1), 2)
-    return (rid("T"), user_id, vehicle_id, datetime.now(timezone.utc).isoformat(), miles, avg_speed, max_speed, harsh_brakes, accel_var, night_pct, speeding_pct, weather_risk)
+    home = random.Random(user_id)
+    lat = CENTER[0] + home.uniform(-HOME_SPREAD, HOME_SPREAD) + random.uniform(-TRIP_SPREAD, TRIP_SPREAD)
+    lon = CENTER[1] + home.uniform(-HOME_SPREAD, HOME_SPREAD) + random.uniform(-TRIP_SPREAD, TRIP_SPREAD)
+    return (rid("T"), user_id, vehicle_id, datetime.now(timezone.utc).isoformat(), miles, avg_speed, max_speed, harsh_brakes, accel_var, night_pct, speeding_pct, weather_risk, geohash.encode(lat, lon, 7))
 
-def main(trips, realtime):
+def main(trips, realtime, direct=False):
     con = sqlite3.connect(str(DB_PATH))
     cur = con.cursor()
     cur.execute("SELECT id, user_id FROM vehicles")
@@ -27,23 +41,35 @@ def main(trips, realtime):
     if not vehs:
         print("No vehicles; initialize DB first.")
         return
+    if not direct:
+        # vehicles are read from SQLite once; trips go to the ingest log for the processor to bulk-load
+        con.close()
+        log = open_writer()
+    report_ready("simulator")
     for i in range(trips):
         vehicle_id, user_id = random.choice(vehs)
         row = simulate_trip(user_id, vehicle_id)
-        cur.execute("""
-        INSERT INTO trips(id,user_id,vehicle_id,ts_utc,miles,avg_speed,max_speed,harsh_brakes,accel_var,night_pct,speeding_pct,weather_risk,processed)
-        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,0)""", row)
-        if i % 20 == 0:
-            con.commit()
+        if direct:
+            cur.execute("""
+            INSERT INTO trips(id,user_id,vehicle_id,ts_utc,miles,avg_speed,max_speed,harsh_brakes,accel_var,night_pct,speeding_pct,weather_risk,geohash,processed)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,0)""", row)
+            if i % 20 == 0:
+                con.commit()
+        else:
+            log.append(encode_trip(row))
         if realtime:
             time.sleep(0.05)
-    con.commit()
-    con.close()
+    if direct:
+        con.commit()
+        con.close()
+    else:
+        log.close()
     print(f"Generated {trips} trips.")
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--trips", type=int, default=200)
     ap.add_argument("--realtime", action="store_true")
+    ap.add_argument("--direct", action="store_true", help="insert into the SQLite trips table instead of the ingest log")
     args = ap.parse_args()
-    main(args.trips, args.realtime)
+    main(args.trips, args.realtime, args.direct)
@@ -12,14 +12,8 @@ import sqlite3
 from pathlib import Path
 import warnings
 
-import joblib
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.calibration import CalibratedClassifierCV
-from sklearn.metrics import roc_auc_score, accuracy_score
-import matplotlib.pyplot as plt
+# pandas/numpy/sklearn/matplotlib/joblib are imported inside the functions that
+# need them so `--help` and plain imports of this module stay fast.
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
@@ -45,6 +39,8 @@ CANDIDATE_LABELS = ["label", "incident", "crash_flag", "target", "y"]
 
 
 def get_columns(conn, table):
+    import pandas as pd
+
     q = f"PRAGMA table_info({table});"
     cols = pd.read_sql(q, conn)["name"].tolist()
     return cols
@@ -52,6 +48,8 @@ def get_columns(conn, table):
 
 def find_source_table(conn):
     """Try common table names in this project."""
+    import pandas as pd
+
     tables = pd.read_sql(
         "SELECT name FROM sqlite_master WHERE type='table';", conn
     )["name"].tolist()
@@ -72,6 +70,8 @@ def find_source_table(conn):
 
 
 def load_dataframe(db_path: str) -> pd.DataFrame:
+    import pandas as pd
+
     if not Path(db_path).exists():
         raise FileNotFoundError(
             f"DB not found at {db_path}. Set UBI_DB_PATH or run python dev.py first."
@@ -142,6 +142,11 @@ def load_dataframe(db_path: str) -> pd.DataFrame:
 
 
 def train_and_calibrate(X, y, random_state=42):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.metrics import roc_auc_score, accuracy_score
+
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.25, random_state=random_state, stratify=y
     )
@@ -167,6 +172,10 @@ def train_and_calibrate(X, y, random_state=42):
 
 
 def plot_calibration(y_true, y_proba, out_path: Path):
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
     # reliability-like curve via binning
     bins = np.linspace(0.0, 1.0, 11)
     idx = np.digitize(y_proba, bins) - 1
@@ -186,6 +195,9 @@ def plot_calibration(y_true, y_proba, out_path: Path):
 
 
 def plot_importances(model, feature_names, out_path: Path):
+    import numpy as np
+    import matplotlib.pyplot as plt
+
     # Works for RF; for Calibrated wrapper, get underlying estimator
     est = getattr(model, "base_estimator", None) or getattr(
         model, "estimator", None
@@ -210,6 +222,9 @@ def main():
     parser.add_argument("--min-trips", type=int, default=200)
     args = parser.parse_args()
 
+    import joblib
+    import pandas as pd
+
     # Quick size check
     if not Path(args.db).exists():
         raise FileNotFoundError(
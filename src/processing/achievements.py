@@ -0,0 +1,68 @@
+from collections import Counter
+from datetime import datetime
+
+# Declarative achievement rules, evaluated one trip at a time.
+# kind:
+#   streak — consecutive trips where `when` holds; a miss resets to 0
+#   total  — running sum of `value(trip)` over trips where `when` holds
+#   weekly — consecutive calendar weeks with at least one trip where `when` holds
+# A badge is earned each time progress reaches `target` (streak/weekly restart, total carries over).
+RULES = [
+    {"badge": "clean-streak-10", "kind": "streak", "target": 10, "when": lambda t: t["harsh_brakes"] == 0},
+    {"badge": "day-miles-500", "kind": "total", "target": 500, "value": lambda t: t["miles"] * (1 - t["night_pct"] / 100.0)},
+    {"badge": "weekly-streak-4", "kind": "weekly", "target": 4},
+]
+
+def week_of(ts_utc):
+    return datetime.fromisoformat(ts_utc).date().toordinal() // 7
+
+def step(rule, progress, marker, trip):
+    """Advance one rule by one trip. Returns (progress, marker, earned)."""
+    kind, when = rule["kind"], rule.get("when")
+    hit = when is None or when(trip)
+    if kind == "streak":
+        progress = progress + 1 if hit else 0
+    elif kind == "total":
+        if hit:
+            progress += rule["value"](trip)
+    elif kind == "weekly":
+        week = week_of(trip["ts_utc"])
+        if not hit or (marker is not None and week <= marker):
+            return progress, marker, False
+        progress = progress + 1 if marker is not None and week == marker + 1 else 1
+        marker = week
+    else:
+        raise ValueError(f"unknown achievement kind: {kind}")
+    if progress >= rule["target"]:
+        return (progress - rule["target"] if kind == "total" else 0), marker, True
+    return progress, marker, False
+
+def load_state(cur, user_ids):
+    """Per-driver progress for every rule: {(user_id, badge): [progress, marker]}."""
+    state = {(u, r["badge"]): [0, None] for u in user_ids for r in RULES}
+    if user_ids:
+        q = f"SELECT user_id, badge, progress, marker FROM achievement_progress WHERE user_id IN ({','.join('?' * len(user_ids))})"
+        for uid, badge, progress, marker in cur.execute(q, tuple(user_ids)):
+            if (uid, badge) in state:
+                state[(uid, badge)] = [progress, marker]
+    return state
+
+def evaluate(state, user_id, trip):
+    """Apply one trip to the driver's state in place; returns the badges it earned."""
+    earned = []
+    for rule in RULES:
+        s = state[(user_id, rule["badge"])]
+        s[0], s[1], got = step(rule, s[0], s[1], trip)
+        if got:
+            earned.append(rule["badge"])
+    return earned
+
+def save(cur, state, awards):
+    """Bulk-write progress and earned badges. awards: [(created_at, user_id, badge, trip_id)]."""
+    cur.executemany("INSERT OR REPLACE INTO achievement_progress(user_id, badge, progress, marker) VALUES (?,?,?,?)",
+                    [(u, b, p, m) for (u, b), (p, m) in state.items()])
+    if awards:
+        cur.executemany("INSERT INTO badges(created_at, user_id, badge, trip_id) VALUES (?,?,?,?)", awards)
+        per_user = Counter(a[1] for a in awards)
+        cur.executemany("UPDATE driver_summary SET badges=COALESCE(badges,0)+? WHERE user_id=?",
+                        [(n, u) for u, n in per_user.items()])
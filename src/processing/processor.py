@@ -1,11 +1,32 @@
 
-import os, sqlite3, time, json
+import os, sqlite3, time, math, argparse, cProfile, threading
 from pathlib import Path
 from datetime import datetime, timezone
 
+try:
+    from src.common.startup import report_ready
+except ImportError:  # run as a script: python src/<pkg>/<module>.py
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.common.startup import report_ready
+from src.processing import achievements
+from src.ingest.ingest_log import ShardedConsumer, decode_trip
+from src.common import profiling
+
 DB_PATH = Path(os.environ.get("UBI_DB_PATH", "data/ubi.db"))
 METRICS_CSV = Path(os.environ.get("UBI_METRICS_CSV", "data/ops_metrics.csv"))
 METRICS_CSV.parent.mkdir(parents=True, exist_ok=True)
+# a new quote is only written when the premium moved by more than QUOTE_EPSILON dollars
+# or the last one for that user/vehicle is older than QUOTE_MAX_AGE_S
+QUOTE_EPSILON = float(os.environ.get("UBI_QUOTE_EPSILON", "1.0"))
+QUOTE_MAX_AGE_S = float(os.environ.get("UBI_QUOTE_MAX_AGE_S", "3600"))
+
+# context_component blends (weather, incident, road) from the context grid; without a grid it is weather only
+CONTEXT_GRID = Path(os.environ.get("UBI_CONTEXT_GRID", "data/context_grid.bin"))
+CONTEXT_WEIGHTS = (0.5, 0.3, 0.2)
+_grid = None
+
+_last_quote = {}  # (user_id, vehicle_id) -> (final_premium, epoch seconds) of the latest stored quote
 
 def compute_risk(miles, avg_speed, max_speed, harsh_brakes, accel_var, night_pct, speeding_pct, weather_risk):
     score = 0.0
@@ -16,51 +37,155 @@ def compute_risk(miles, avg_speed, max_speed, harsh_brakes, accel_var, night_pct
     score += min(10, weather_risk * 10)
     return max(0.0, min(100.0, score))
 
-def price(base_rate, miles_month, risk_score, weather_risk):
+def price(base_rate, miles_month, risk_score, context_risk):
     usage = 0.05 * miles_month
     behavior = (risk_score/100.0) * 40.0
-    context = weather_risk * 5.0
+    context = context_risk * 5.0
     final = round(base_rate + usage + behavior + context, 2)
     return final, usage, behavior, context
 
-def loop():
+def context_grid():
+    global _grid
+    if _grid is None and CONTEXT_GRID.exists():
+        from src.context.grid import ContextGrid  # numpy; only once a grid exists
+        _grid = ContextGrid(CONTEXT_GRID)
+    return _grid
+
+def context_factors(rows):
+    """(weather, incident, road) per trip via one vectorized grid lookup; trips outside the grid
+    (or no grid at all) keep their own weather_risk and get no incident/road factors."""
+    grid = context_grid()
+    if grid is None or not rows:
+        return [(r[11], None, None) for r in rows]
+    hours = [datetime.fromisoformat(r[3]).astimezone(timezone.utc).hour for r in rows]
+    ctx = grid.lookup([r[12] for r in rows], hours)
+    # grid factors are quantized to ~0.004; report them at the precision of the device weather_risk
+    return [(r[11], None, None) if math.isnan(c[0]) else tuple(round(float(v), 2) for v in c)
+            for r, c in zip(rows, ctx)]
+
+def context_risk(weather, incident, road):
+    if incident is None:
+        return weather
+    w = CONTEXT_WEIGHTS
+    return w[0]*weather + w[1]*incident + w[2]*road
+
+def should_emit_quote(cur, uid, vid, final, now):
+    key = (uid, vid)
+    if key not in _last_quote:
+        row = cur.execute("SELECT final_premium, created_at FROM quotes WHERE user_id=? AND vehicle_id=? ORDER BY id DESC LIMIT 1", key).fetchone()
+        _last_quote[key] = (row[0], datetime.fromisoformat(row[1]).timestamp()) if row else None
+    last = _last_quote[key]
+    if last is None or abs(final - last[0]) > QUOTE_EPSILON or now - last[1] >= QUOTE_MAX_AGE_S:
+        _last_quote[key] = (final, now)
+        return True
+    return False
+
+def process_batch(con, limit=200):
+    cur = con.cursor()
+    cur.execute("SELECT id,user_id,vehicle_id,ts_utc,miles,avg_speed,max_speed,harsh_brakes,accel_var,night_pct,speeding_pct,weather_risk,geohash FROM trips WHERE processed=0 LIMIT ?", (limit,))
+    rows = cur.fetchall()
+    state = achievements.load_state(cur, {r[1] for r in rows})
+    awards = []
+    for (tid, uid, vid, ts, miles, avg, mx, hb, av, night, spd, _, _), (wrisk, incident, road) in zip(rows, context_factors(rows)):
+        base_rate = cur.execute("SELECT base_rate FROM vehicles WHERE id=?", (vid,)).fetchone()
+        base = base_rate[0] if base_rate else 80.0
+        risk = compute_risk(miles, avg, mx, hb, av, night, spd, wrisk)
+        final, usage, behavior, context = price(base, miles, risk, context_risk(wrisk, incident, road))
+        now = datetime.now(timezone.utc)
+        if should_emit_quote(cur, uid, vid, final, now.timestamp()):
+            cur.execute("""
+                INSERT INTO quotes(created_at,user_id,vehicle_id,base_component,usage_component,behavior_component,context_component,final_premium,risk_score,f_speeding_pct,f_harsh_brakes,f_night_pct,f_weather_risk)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+            """, (now.isoformat(), uid, vid, base, round(usage,2), round(behavior,2), round(context,2), final, round(risk,2), spd, hb, night, wrisk))
+        points = int(max(0, 20 - risk/5))
+        cur.execute("INSERT INTO rewards(created_at,user_id,points,reason,trip_id) VALUES (?,?,?,?,?)",
+                    (datetime.now(timezone.utc).isoformat(), uid, points, "safe-trip", tid))
+        cur.execute("UPDATE driver_summary SET points=COALESCE(points,0)+?, risk_score=? WHERE user_id=?", (points, risk, uid))
+        for badge in achievements.evaluate(state, uid, {"ts_utc": ts, "miles": miles, "harsh_brakes": hb, "night_pct": night}):
+            awards.append((now.isoformat(), uid, badge, tid))
+        # trips.weather_risk stays as reported; grid factors (NULL outside the grid) go alongside it
+        ctx = (wrisk, incident, road) if incident is not None else (None, None, None)
+        cur.execute("UPDATE trips SET processed=1, ctx_weather=?, ctx_incident=?, ctx_road=? WHERE id=?", (*ctx, tid))
+    achievements.save(cur, state, awards)
+    con.commit()
+    return len(rows)
+
+def load_from_log(con, consumer, limit=200):
+    """Bulk-load the next trips from the ingest log into SQLite; committed together with process_batch."""
+    rows = [decode_trip(p) for p in consumer.read(limit)]
+    # OR IGNORE: trips loaded but not yet acknowledged in the log before a crash are re-read on restart
+    con.executemany("""
+        INSERT OR IGNORE INTO trips(id,user_id,vehicle_id,ts_utc,miles,avg_speed,max_speed,harsh_brakes,accel_var,night_pct,speeding_pct,weather_risk,geohash,processed)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,0)""", rows)
+    return len(rows)
+
+def step(con, consumer, limit=200):
+    """One processor iteration: log → SQLite → quotes/rewards, then acknowledge the log. Returns (trips, lag)."""
+    load_from_log(con, consumer, limit)
+    n = process_batch(con, limit)
+    consumer.commit()
+    return n, consumer.lag()
+
+def profiled_step(consumer, mode):
+    """step() under cProfile or the stack sampler, with per-statement SQL timing.
+    Batches that processed trips are written to PROFILE_DIR as processor-*.prof or *.collapsed + *.sql.txt."""
+    profiling.SQL_STATS.reset()
+    profiling.SQL_STATS.enabled = True
+    con = profiling.connect(DB_PATH)
+    if mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+    else:
+        sampler = profiling.StackSampler(interval=0.001, thread_ids={threading.get_ident()}).start()
+    try:
+        n, lag = step(con, consumer)
+    finally:
+        if mode == "cprofile":
+            prof.disable()
+        else:
+            sampler.stop()
+        con.close()
+        profiling.SQL_STATS.enabled = False
+    if n:
+        path = profiling.profile_path("processor", ".prof" if mode == "cprofile" else ".collapsed")
+        if mode == "cprofile":
+            prof.dump_stats(str(path))
+        else:
+            path.write_text(sampler.collapsed() + "\n", encoding="utf-8")
+        path.with_suffix(".sql.txt").write_text(profiling.format_sql_report(profiling.SQL_STATS.report()), encoding="utf-8")
+    return n, lag
+
+def loop(profile=None, profile_batches=20):
     if not METRICS_CSV.exists():
         with open(METRICS_CSV, "w", encoding="utf-8") as f:
             f.write("ts_utc,events_per_min,feature_latency_ms,api_p50_ms,api_p95_ms,queue_lag_events\n")
+    consumer = ShardedConsumer("processor")
+    report_ready("processor")
+    profiled = 0
     while True:
         start = time.time()
-        con = sqlite3.connect(str(DB_PATH))
-        cur = con.cursor()
-        cur.execute("SELECT id,user_id,vehicle_id,miles,avg_speed,max_speed,harsh_brakes,accel_var,night_pct,speeding_pct,weather_risk FROM trips WHERE processed=0 LIMIT 200")
-        rows = cur.fetchall()
-        for (tid, uid, vid, miles, avg, mx, hb, av, night, spd, wrisk) in rows:
-            base_rate = cur.execute("SELECT base_rate FROM vehicles WHERE id=?", (vid,)).fetchone()
-            base = base_rate[0] if base_rate else 80.0
-            risk = compute_risk(miles, avg, mx, hb, av, night, spd, wrisk)
-            final, usage, behavior, context = price(base, miles, risk, wrisk)
-            expl = json.dumps({"rule": True, "factors": {"speeding_pct": spd, "harsh_brakes": hb, "night_pct": night, "weather_risk": wrisk}})
-            cur.execute("""
-                INSERT INTO quotes(created_at,user_id,vehicle_id,base_component,usage_component,behavior_component,context_component,final_premium,risk_score,explanations)
-                VALUES (?,?,?,?,?,?,?,?,?,?)
-            """, (datetime.now(timezone.utc).isoformat(), uid, vid, base, round(usage,2), round(behavior,2), round(context,2), final, round(risk,2), expl))
-            points = int(max(0, 20 - risk/5))
-            cur.execute("INSERT INTO rewards(created_at,user_id,points,reason,trip_id) VALUES (?,?,?,?,?)",
-                        (datetime.now(timezone.utc).isoformat(), uid, points, "safe-trip", tid))
-            cur.execute("UPDATE driver_summary SET points=COALESCE(points,0)+?, risk_score=? WHERE user_id=?", (points, risk, uid))
-            cur.execute("UPDATE trips SET processed=1 WHERE id=?", (tid,))
-        con.commit()
-        lag = cur.execute("SELECT COUNT(*) FROM trips WHERE processed=0").fetchone()[0]
-        con.close()
+        if profile and profiled < profile_batches:
+            n, lag = profiled_step(consumer, profile)
+            profiled += n > 0
+        else:
+            con = sqlite3.connect(str(DB_PATH))
+            n, lag = step(con, consumer)
+            con.close()
 
         # ops metrics row
         elapsed = max(0.001, time.time()-start)
-        ev_per_min = len(rows) * 60 / elapsed
-        feature_latency_ms = 20 + (len(rows)%5)*5
-        api_p50_ms = 40 + (len(rows)%7)*2
-        api_p95_ms = 85 + (len(rows)%9)*4
+        ev_per_min = n * 60 / elapsed
+        feature_latency_ms = 20 + (n%5)*5
+        api_p50_ms = 40 + (n%7)*2
+        api_p95_ms = 85 + (n%9)*4
         with open(METRICS_CSV, "a", encoding="utf-8") as f:
             f.write(f"{datetime.now(timezone.utc).isoformat()},{ev_per_min:.1f},{feature_latency_ms},{api_p50_ms},{api_p95_ms},{lag}\n")
         time.sleep(1)
 
 if __name__ == "__main__":
-    loop()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                    help="profile non-empty batches: cProfile .prof files or sampled collapsed stacks (flamegraph input)")
+    ap.add_argument("--profile-batches", type=int, default=20, help="stop profiling after this many non-empty batches")
+    args = ap.parse_args()
+    loop(args.profile, args.profile_batches)